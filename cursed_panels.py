@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
 # A small, text-based matching game.
 
-import curses, argparse, random, time, math
+import curses, argparse, time, math, signal
+
+import numpy as np
+
+try:
+  from numba import njit
+except ImportError:
+  # Numba is optional. Without it, the stack kernels run as plain NumPy code.
+  def njit(**kwargs):
+    return lambda func: func
 
 # Key to press to pause the game.
 PAUSE = "p"
@@ -9,6 +18,13 @@ PAUSE = "p"
 # Key to press to select a panel.
 SELECT = "s"
 
+# Codes that getch returns for the keys above, and for the keys used to answer
+# whether to play again after a game over.
+PAUSE_ORD = ord(PAUSE)
+SELECT_ORD = ord(SELECT)
+KEY_Y = ord('y')
+KEY_N = ord('n')
+
 # Constant representing directions on how to play the game that can be
 # displayed in a window in-game.
 DIRECTIONS = "Move(arrows), Select({})\nPause({})".format(SELECT, PAUSE)
@@ -19,6 +35,9 @@ SELECT_ON = DIRECTIONS + ", Select ON"
 # Constant text to show that the game is paused and how to unpause.
 PAUSE_TEXT = "Paused\nUnpause = {}".format(PAUSE)
 
+# Constant text to show while the game is getting ready to start.
+LOADING_TEXT = "Loading..."
+
 # Number of adjacent symbols of the same type required to make a match
 # (i.e. %%% or &&& for a MIN_MATCH of 2).
 MIN_MATCH = 2
@@ -59,135 +78,269 @@ DEFAULT_WIDTH = 12
 # Default starting speed for a new game.
 DEFAULT_SPEED = 1
 
+# Number of milliseconds to wait for a key on each pass of the game loop, which
+# keeps the loop from spinning while nothing happens (about 60 passes/second).
+FRAME_TIMEOUT = 16
+
+# mark_runs is specialized for MIN_MATCH when the module is loaded, so that the
+# common case of MIN_MATCH = 2 is a fixed handful of comparisons with no loops.
+if MIN_MATCH == 2:
+  @njit(cache=True)
+  def mark_runs(stack, marked):
+    """Set every cell of marked that corresponds to a cell of stack which is
+    part of a run of more than MIN_MATCH equal, non-empty panels along the
+    first axis of stack."""
+
+    # A run starts at a cell when it and the two cells following it hold the
+    # same symbol. Longer runs are covered by the overlapping starts along them.
+    start = (stack[:-2] != 0) & (stack[:-2] == stack[1:-1]) & (stack[1:-1] == stack[2:])
+    marked[:-2] |= start
+    marked[1:-1] |= start
+    marked[2:] |= start
+else:
+  @njit(cache=True)
+  def mark_runs(stack, marked):
+    """Set every cell of marked that corresponds to a cell of stack which is
+    part of a run of more than MIN_MATCH equal, non-empty panels along the
+    first axis of stack."""
+
+    # A run starts at a cell when it and the MIN_MATCH cells following it hold
+    # the same symbol.
+    starts = max(stack.shape[0] - MIN_MATCH, 0)
+    start = stack[:starts] != 0
+    for k in range(1, MIN_MATCH + 1):
+      start &= stack[:starts] == stack[k:starts + k]
+
+    # Spread each start over the rest of its run. Longer runs are covered by
+    # the overlapping starts along them.
+    for k in range(MIN_MATCH + 1):
+      marked[k:starts + k] |= start
+
+@njit(cache=True)
+def eliminate_runs(stack, marked):
+  """Empty every panel of stack that is part of a run of more than MIN_MATCH
+  equal panels along either axis, using marked as a Boolean mask of the same
+  shape to mark them in. Returns the number of panels emptied."""
+
+  # Mark runs along the length of the stack, then along its width by marking
+  # through the transposed views of the same arrays.
+  marked[:] = False
+  mark_runs(stack, marked)
+  mark_runs(stack.T, marked.T)
+
+  # Numba can only index with one-dimensional masks, so the marked panels are
+  # emptied with where instead of stack[marked] = 0.
+  stack[:] = np.where(marked, 0, stack)
+  return marked.sum()
+
+@njit(cache=True)
+def drop_panels(stack):
+  """Drop every panel of stack as far toward the start of its line as it can
+  go. Returns a Boolean array marking the lines in which any panel moved."""
+
+  compacted = np.zeros(stack.shape[1], dtype=np.bool_)
+  for idy in range(stack.shape[1]):
+    line = stack[:, idy]
+    panels = line[line != 0]
+
+    # Nothing moves when the panels are already packed at the start.
+    count = panels.size
+    if not line[:count].all():
+      line[:count] = panels
+      line[count:] = 0
+      compacted[idy] = True
+  return compacted
+
+@njit(cache=True)
+def settle_stack(stack):
+  """Eliminate the runs in stack and compact it over and over until no panel
+  falls any further. Returns a list of the number of panels eliminated at each
+  step of the resulting chain."""
+
+  # A single mask is shared by every step of the chain.
+  marked = np.zeros(stack.shape, dtype=np.bool_)
+
+  elims = []
+  first = 0
+  last = stack.shape[1]
+  while True:
+    # Both the elimination and the compaction only touch the lines of the
+    # stack that can have changed, read through one shared view.
+    area = stack[:, first:last]
+    elims.append(eliminate_runs(area, marked[:, first:last]))
+
+    compacted = np.flatnonzero(drop_panels(area)) + first
+    if compacted.size == 0:
+      break
+
+    # Any new match has to include a panel that fell, and can reach at most
+    # MIN_MATCH panels beyond it, since those alone could not have matched
+    # before. Only the lines around the compacted ones need checking again.
+    # Panels only fall into spaces left by those eliminations, so the same
+    # lines are all that need compacting.
+    first = max(compacted[0] - MIN_MATCH, 0)
+    last = min(compacted[-1] + 1 + MIN_MATCH, stack.shape[1])
+  return elims
+
+def warm_up_kernels():
+  """Run the stack kernels once on a throwaway stack of the same type as the
+  game uses. With Numba, this is when they get compiled (only the first time,
+  or after this file changes) instead of freezing the game at the first swap or
+  advance."""
+
+  # An interrupt in the middle of a Numba compile breaks the compile rather
+  # than stopping it cleanly, so one arriving now is held back until the
+  # kernels are ready.
+  interrupted = []
+  handler = signal.signal(signal.SIGINT, lambda signum, frame: interrupted.append(signum))
+  try:
+    settle_stack(np.zeros((MIN_MATCH + 1, MIN_MATCH + 1), dtype=np.uint8))
+  finally:
+    signal.signal(signal.SIGINT, handler)
+
+  if interrupted:
+    raise KeyboardInterrupt()
+
 class PanelStack:
-  """Class abstracting the stack of panels used in the game."""
+  """Class abstracting the stack of panels used in the game. The stack is kept
+  as a 2D uint8 array indexed by [length, width], where 0 is an empty space and
+  1 through len(symbols) are indices (offset by one) into the symbol set."""
   
   def __init__(self, rate, symbols, length, width, start_x, start_y):
     
     self.spd = rate
     self.symbols = symbols
-    self.rng = random.Random()
+
+    # Lookup tables from symbol codes to the bytes drawn for them, encoded once
+    # so lines of the stack can be handed to curses as bytes. Empties are drawn
+    # as spaces, except at the end of the stack where they are a bar.
+    sym_bytes = ''.join(symbols).encode('ascii')
+    self.glyphs = np.frombuffer(b' ' + sym_bytes, dtype=np.uint8)
+    self.end_glyphs = np.frombuffer(b'|' + sym_bytes, dtype=np.uint8)
+    self.rng = np.random.default_rng()
     self.length = length
     self.width = width
+    self.stack = np.zeros((length, width), dtype=np.uint8)
+
+    # Copy of the stack as it was last drawn, so that only what changed needs
+    # to be drawn again. 255 is never used as a panel code, so starting from it
+    # forces everything to be drawn the first time.
+    self.prev_stack = np.full_like(self.stack, 255)
     self.stack_win = curses.newwin(width, length, start_y, start_x)
     self.pause_diff = 0.0
     self.last_up = time.monotonic()
     self.build_initial_stack()
+
+  @property
+  def spd(self):
+    """The speed at which the stack advances."""
+
+    return self._spd
+
+  @spd.setter
+  def spd(self, spd):
+    """Set the speed at which the stack advances, along with the number of
+    seconds between advances at that speed. The interval is kept since
+    advance_ready is checked on every pass of the game loop."""
+
+    self._spd = spd
+    self.adv_interval = BASE_ADV_SPEED/math.log2(spd + 1)
     
   def build_initial_stack(self):
     """Build the initial stack based on the symbols provided, the RNG,
     the lenght of the stack, and the width of the stack."""
     
-    self.stack = []
-
-    # Stop before reaching the top of the window.
-    cutoff = MAX_INIT_HEIGHT * self.length
-
-    # Get the number of symbols. This number is also used as a value unto itself
-    # to signify an empty space.
+    # Get the number of symbols. Symbols are coded from 1 to nsym, so drawing
+    # a 0 signifies an empty space.
     nsym = len(self.symbols)
+
+    # Draw every panel at once, then stop before reaching the top of the window.
+    self.stack[:] = self.rng.integers(0, nsym + 1, size=self.stack.shape, dtype=np.uint8)
+    self.stack[math.ceil(MAX_INIT_HEIGHT * self.length):] = 0
     
-    for l in range(self.length):
+    for l in range(1, self.length):
       
-      self.stack.append([])
       for w in range(self.width):
-        if l > 0:
-          if self.stack[l - 1][w] == '' or l >= cutoff:
-            self.stack[l].append('')
-            continue
-          else:
-            
-            # Try to prevent symbols being placed that would result in an
-            # immediate match on either rows or columns.
-            bad_row = True
-            bad_col = True
-            while bad_row or bad_col:
-              sym = self.rng.randint(0, nsym)
-              
-              if sym == nsym: # Going to be blank, which is always OK.
-                break
-              
-              if l >= MIN_MATCH:
-                matches = [self.stack[x][w] for x in range(l - MIN_MATCH, l) if self.stack[x][w] == self.symbols[sym]]
-                if len(matches) < MIN_MATCH:
-                  bad_row = False
-              else:
-                bad_row = False
-              
-              if w >= MIN_MATCH:
-                matches = [self.stack[l][y] for y in range(w - MIN_MATCH, w) if self.stack[l][y] == self.symbols[sym]]
-                if len(matches) < MIN_MATCH:
-                  bad_col = False
-              else:
-                bad_col = False
-            
-        else:
-          sym = self.rng.randint(0, nsym)
+        if self.stack[l - 1, w] == 0:
+          self.stack[l, w] = 0 # Nothing to rest on, so it has to be empty.
+          continue
+        
+        # Prevent symbols being placed that would result in an immediate
+        # match on either rows or columns by redrawing any symbol that the
+        # preceding MIN_MATCH panels all share. Blank is always OK.
+        forbidden = set()
+        if l >= MIN_MATCH:
+          run = self.stack[l - MIN_MATCH:l, w]
+          if run[0] != 0 and (run == run[0]).all():
+            forbidden.add(int(run[0]))
         
-        if sym == nsym:
-          self.stack[l].append('') # Length will be considered an empty.
-        else:
-          self.stack[l].append(self.symbols[sym])
+        if w >= MIN_MATCH:
+          run = self.stack[l, w - MIN_MATCH:w]
+          if run[0] != 0 and (run == run[0]).all():
+            forbidden.add(int(run[0]))
+        
+        if self.stack[l, w] in forbidden:
+          self.stack[l, w] = self.rng.choice([s for s in range(nsym + 1) if s not in forbidden])
           
   def advance_stack(self):
     """Advances the stack by adding an additional line of symbols to the rear."""
     
-    row = []
-    for w in range(self.width):
-      sym = self.symbols[self.rng.randint(0, len(self.symbols) - 1)]
-
-      # Ensure that there are not inter-row matches.
-      if w >= MIN_MATCH:
-        bad_sym = True
-        while bad_sym:
-          matches = [row[y] for y in range(w - MIN_MATCH, w) if row[y] == sym]
-          if len(matches) >= MIN_MATCH:
-            sym = self.symbols[self.rng.randint(0, len(self.symbols) - 1)]
-          else:
-            bad_sym = False
-
-      row.append(sym)
-    
-    del self.stack[self.length - 1]
-    self.stack.insert(0, row)
+    nsym = len(self.symbols)
+    row = self.rng.integers(1, nsym + 1, size=self.width, dtype=np.uint8)
+
+    # Ensure that there are not inter-row matches. These are rare, so the
+    # offending panels are redrawn afterwards rather than checking every draw.
+    # A single symbol can't avoid matching, so it is left to be eliminated.
+    if nsym > 1:
+      for w in range(MIN_MATCH, self.width):
+        run = row[w - MIN_MATCH:w]
+        if (run == row[w]).all():
+          row[w] = self.rng.choice([s for s in range(1, nsym + 1) if s != row[w]])
+    
+    # Shift every line one further along the stack in place, dropping the last
+    # one, and put the new line in the vacated first position.
+    self.stack[1:] = self.stack[:-1]
+    self.stack[0] = row
     self.last_up = time.monotonic()
 
   def print_stack(self):
     """Print the stack line by line."""
     
-    self.stack_win.clear()
-    for idx, row in enumerate(self.stack):
-      for idy, elem in enumerate(row):
-        try:
-          if elem != '':
-            self.stack_win.addch(idy, idx, elem)
-          elif idx == self.length - 1:
-            self.stack_win.addch(idy, idx, '|')
-        except curses.error:
-          pass # This is apparently a spurious error caused by the cursor
-               # being placed outside of the window when writing to the 
-               # lower right corner of a window.
-    
-    self.stack_win.refresh()
+    # Laid out as the window is, so that each line's bytes are contiguous.
+    chars = self.glyphs[self.stack.T]
+    chars[:, self.length - 1] = self.end_glyphs[self.stack[self.length - 1]]
+
+    # Rather than clearing the window, only the part of each line between its
+    # first and last changed panels is written again, over what is already
+    # there.
+    changed = self.stack != self.prev_stack
+    try:
+      # The stack runs along the lines of the window, so each line is made up
+      # of one position across the width of the stack.
+      for idy in np.flatnonzero(changed.any(axis=0)):
+        idxs = np.flatnonzero(changed[:, idy])
+        first, last = idxs[0], idxs[-1] + 1
+        self.stack_win.addstr(idy, first, chars[idy, first:last].tobytes())
+    except curses.error:
+      pass # This is apparently a spurious error caused by the cursor
+           # being placed outside of the window when writing to the
+           # lower right corner of a window.
+    
+    np.copyto(self.prev_stack, self.stack)
+    self.stack_win.noutrefresh()
 
   def game_over(self):
     """Check the last column of the stack to see if it has hit the end of the
     screen, thus causing a game over."""
 
-    game_over = False
-    for idy in range(self.width):
-      if self.stack[self.length - 1][idy] != '':
-        game_over = True
-        break
-
-    return game_over
+    return bool(self.stack[self.length - 1].any())
 
   def advance_ready(self):
     """Determine if the stack should be advanced or not based on the 
     monotonic (float) time of the last advance and the current speed
     at which the stack should advance. Returns a Boolean."""
     
-    if time.monotonic() - self.last_up >= BASE_ADV_SPEED/math.log2(self.spd + 1):
+    if time.monotonic() - self.last_up >= self.adv_interval:
       return True
     else:
       return False
@@ -198,9 +351,9 @@ class PanelStack:
     location. Triggers a check_stack to see if the move eliminates any characters,
     and returns the results of the check."""
 
-    old = self.stack[old_x][old_y]
-    self.stack[old_x][old_y] = self.stack[new_x][new_y]
-    self.stack[new_x][new_y] = old
+    old = self.stack[old_x, old_y]
+    self.stack[old_x, old_y] = self.stack[new_x, new_y]
+    self.stack[new_x, new_y] = old
 
     return self.check_stack()
 
@@ -219,85 +372,33 @@ class PanelStack:
   
   def compact(self):
     """Compact the stack by making all pieces with a space below them fall into
-    the lowest possible spot. Returns a Boolean representing whether the stack
-    was compacted at all or not."""
-
-    compacted = False
-    for idx in range(1, self.length):
-      for idy, elem in enumerate(self.stack[idx]):
-        if elem != '':
-          # Check all spaces below the current element. If there are any, drop
-          # it to the lowest empty space reachable.
-          down = idx - 1
-          while down >= 0 and self.stack[down][idy] == '':
-            self.stack[down][idy] = elem
-            self.stack[down + 1][idy] = ''
-            compacted = True
-            down -= 1
-    return compacted
+    the lowest possible spot. Returns a Boolean array marking the lines across
+    the width of the stack that were compacted."""
+
+    return drop_panels(self.stack)
 
   def check_stack(self):
     """Check the stack to determine if any panels need to be removed or have
     their locations updated. Returns the number of panels eliminated and the
     score received for said eliminations."""
 
-    marked = set()
-
-    for idx, row in enumerate(self.stack):
-      for idy, elem in enumerate(row):
-        same_down = 0
-        same_right = 0
-        if elem == '':
-          continue # Nothing to do with an empty.
-        if idx < self.length - MIN_MATCH:
-          right = idx + 1
-          while right < self.length and self.stack[right][idy] == elem:
-            same_right += 1
-            right += 1
-        if idy < self.width - MIN_MATCH:
-          down = idy + 1
-          while down < self.width and self.stack[idx][down] == elem:
-            same_down += 1
-            down += 1
-
-        if same_down >= MIN_MATCH or same_right >= MIN_MATCH:
-          # Eliminate one for the element. It could have some above or below
-          # that need to be accounted for.
-          marked.add((idx, idy))
-
-          if same_down >= MIN_MATCH:
-            # Offset in the range since 0 is the main element at idx, idy.
-            for y in range(1, same_down + 1):
-              marked.add((idx, idy + y))
-          if same_right >= MIN_MATCH:
-            for x in range(1, same_right + 1):
-              marked.add((idx + x, idy))
-
-    elim = len(marked)
-    for idx, idy in marked:
-      self.stack[idx][idy] = ''
-
-    compacted = self.compact()
-
-    comp_elims = 0
-    comp_score = 0
-    # Check for new eliminations that can result from a compaction.
-    if compacted:
-      comp_elims, comp_score = self.check_stack()
+    # Eliminate and compact until nothing more falls, keeping the number of
+    # panels eliminated at each step of the chain.
+    elims = settle_stack(self.stack)
 
     # Eliminations are just the total panels eliminated, no extras needed to
     # calculate.
-    total_elims = elim + comp_elims
+    total_elims = int(sum(elims))
 
     # Score is calculated as the square of eliminations, plus the double of
-    # the compaction score so that eliminating more panels in a chain yields
-    # a higher score.
-    if elim > 0:
-      total_score = round(elim**ELIM_SCORE_EXP + CHAIN_MULT * comp_score)
-    # If no eliminations were made this time, then a panel may have been moved
-    # into an empty space rather potentially starting a chain.
-    else:
-      total_score = comp_score
+    # the score of the rest of the chain so that eliminating more panels in a
+    # chain yields a higher score, so it is worked out from the end of the
+    # chain. If no eliminations were made at a step, then a panel may have
+    # been moved into an empty space rather potentially starting a chain.
+    total_score = 0
+    for elim in reversed(elims):
+      if elim > 0:
+        total_score = round(elim**ELIM_SCORE_EXP + CHAIN_MULT * total_score)
 
     return (total_elims, total_score)
 
@@ -310,8 +411,12 @@ class PanelStack:
     self.pause_diff = time.monotonic() - self.last_up
 
     # Clears the screen so the player can't pause to figure out their next move.
-    self.stack_win.clear()
-    self.stack_win.refresh()
+    # Nothing is left on screen, so everything has to be drawn again afterwards.
+    # Erasing blanks just this window, where clear would also make curses
+    # repaint the whole terminal on the next update.
+    self.stack_win.erase()
+    self.stack_win.noutrefresh()
+    self.prev_stack.fill(255)
     
   def unpause(self):
     """Unpause the stack advance by setting the last time an advance occured
@@ -410,29 +515,29 @@ class CursedPanels:
   def update_score(self):
     """Update the score window with the current score."""
     
-    self.score_win.clear()
+    self.score_win.erase()
     self.score_win.addstr("Score\n{}".format(self.score))
-    self.score_win.refresh()
+    self.score_win.noutrefresh()
     self.last_score = self.score
     
   def update_speed(self):
     """Update the speed window with the current stack speed."""
     
-    self.speed_win.clear()
+    self.speed_win.erase()
     self.speed_win.addstr("Speed\n{}".format(self.stack.spd))
-    self.speed_win.refresh()
+    self.speed_win.noutrefresh()
     self.last_spd = self.stack.spd
     
   def set_status(self, status=None):
     """Update the status window to display the given string. Pass None to display
     the game instructions."""
     
-    self.status_win.clear()
+    self.status_win.erase()
     if status:
       self.status_win.addstr(status)
     else:
       self.status_win.addstr(DIRECTIONS)
-    self.status_win.refresh()
+    self.status_win.noutrefresh()
   
   def game(self, stdscr):
     """Play the game during the event loop."""
@@ -442,6 +547,7 @@ class CursedPanels:
     up_stack = self.stack.advance_ready()
     up_score = self.score != self.last_score
     up_spd = self.stack.spd != self.last_spd
+    up_status = False
     elims = 0
 
     moved = False
@@ -450,10 +556,11 @@ class CursedPanels:
     # key handling and would be needed if select mode is on.
     old_cursor = (self.cursor.px, self.cursor.py)
     inp = stdscr.getch()
-    if inp == ord(PAUSE):
+    if inp == PAUSE_ORD:
       self.mode = self.pause
-    elif inp == ord(SELECT):
+    elif inp == SELECT_ORD:
       self.cursor.select = not self.cursor.select
+      up_status = True
       if self.cursor.select:
         self.set_status(SELECT_ON)
       else:
@@ -480,13 +587,6 @@ class CursedPanels:
       self.panels += elims
       self.score += score
 
-    if any((up_stack, up_score, up_spd, self.cursor.refresh)):
-      stdscr.refresh()
-    
-    # Because the cursor is constantly moving due to curses, always
-    # render the cursor.
-    self.cursor.render(stdscr)
-
     if up_stack:
       (elims, score, game_over) = self.stack.update_stack()
       
@@ -512,6 +612,16 @@ class CursedPanels:
     # to increase the first time, but will increase at the same rate afterwards.
     if self.panels > (self.stack.spd * BASE_PANEL_THRESH)**SPEED_UP_EXP:
       self.stack.spd += 1
+
+    # Windows only stage their updates, and they are all written to the
+    # terminal at once here. Because the cursor is constantly moving due to
+    # curses, always render the cursor, and do so last so that the terminal
+    # cursor ends up on it.
+    redraw = up_stack or up_score or up_spd or up_status or self.cursor.refresh
+    self.cursor.render(stdscr)
+    if redraw:
+      stdscr.noutrefresh()
+      curses.doupdate()
   
   def pause(self, stdscr):
     """Pause the game."""
@@ -521,19 +631,21 @@ class CursedPanels:
     self.stack.pause()
 
     self.set_status(PAUSE_TEXT)
+    curses.doupdate()
 
     while True:
       inp = stdscr.getch()
-      if inp == ord(PAUSE):
+      if inp == PAUSE_ORD:
         break
 
-    stdscr.nodelay(True)
+    stdscr.timeout(FRAME_TIMEOUT)
     self.mode = self.game
     if self.cursor.select:
       self.set_status(SELECT_ON)
     else:
       self.set_status()
     self.stack.unpause()
+    curses.doupdate()
 
 
   def game_over(self, stdscr):
@@ -541,17 +653,18 @@ class CursedPanels:
     stdscr.nodelay(False) # Make sure getch blocking.
     
     self.set_status("Game Over\nAgain (y/n)?")
+    curses.doupdate()
     
     cont = True
     
     while cont:
       inp = stdscr.getch()
-      if inp == ord('y'):
+      if inp == KEY_Y:
         cont = False
-      elif inp == ord('n'):
+      elif inp == KEY_N:
         raise KeyboardInterrupt() # Since this is already handled for quitting by the main loop.
     
-    stdscr.nodelay(True) # Don't want to block it anymore.
+    stdscr.timeout(FRAME_TIMEOUT) # Don't want to block it anymore.
     self.reset(stdscr)
   
   def reset(self, stdscr):
@@ -561,11 +674,12 @@ class CursedPanels:
     self.stack.spd = self.base_spd
     self.stack.build_initial_stack()
     
-    stdscr.refresh()
+    stdscr.noutrefresh()
     self.update_score()
     self.update_speed()
     self.stack.print_stack()
     self.set_status()
+    curses.doupdate()
     
     self.mode = self.game
   
@@ -573,16 +687,22 @@ class CursedPanels:
     """Run the game loop, including handling the game logic and any key events."""
     
     stdscr.clear()
-    stdscr.nodelay(True) # Make sure getch is nonblocking.
+    stdscr.timeout(FRAME_TIMEOUT) # Make sure getch only blocks for a frame.
     stdscr.keypad(True) # So special keys come as single keystrokes rather than sequences.
     
-    stdscr.refresh()
+    stdscr.noutrefresh()
     self.update_score()
     self.update_speed()
-    self.set_status()
-    self.stack.print_stack()
+    self.set_status(LOADING_TEXT)
+    curses.doupdate()
     
     try:
+      warm_up_kernels()
+
+      self.set_status()
+      self.stack.print_stack()
+      curses.doupdate()
+
       while True:
         self.mode(stdscr)
     
@@ -604,7 +724,14 @@ def parse_opts():
   parser.add_argument('-w', '--width', metavar="WDT", type=int, default=DEFAULT_WIDTH,
                       help="Width of the stack. Defaults to {} characters.".format(DEFAULT_WIDTH))
   
-  return parser.parse_args()      
+  opts = parser.parse_args()
+
+  # Each panel takes up exactly one character cell, drawn as a single byte.
+  for sym in opts.symbols:
+    if len(sym) != 1 or not sym.isascii():
+      parser.error("symbols must be single ASCII characters, got '{}'".format(sym))
+
+  return opts
       
 
 def game(stdscr, opts):